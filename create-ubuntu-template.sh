@@ -1,9 +1,10 @@
 #!/bin/bash
 set -e
 
-TEMPLATE_NAME="ubuntu-${RELEASE}-template"
 DATA_STORE="local-lvm"
 VM_BRIDGE="vmbr0"
+IMAGE_MIRROR="${IMAGE_MIRROR:-https://cloud-images.ubuntu.com}"
+IMAGE_DIR="${IMAGE_DIR:-${XDG_CACHE_HOME:-$HOME/.cache}/proxmox-utilities/images}"
 
 
 # Check if exactly two arguments are passed
@@ -35,32 +36,84 @@ else
     exit 1
 fi
 
-# Check if dest_value is greater than 9000
-if [ "$TEMPLATE_ID" -gt 9000 ]; then
+# Check if dest_value is a number greater than 9000
+if [[ "$TEMPLATE_ID" =~ ^[0-9]+$ ]] && [ "$TEMPLATE_ID" -gt 9000 ]; then
     echo "TEMPLATE_ID: $TEMPLATE_ID is greater than 9000"
 else
     echo "Error: Destination Value must be greater than 9000."
     exit 1
 fi
 
-# Get the ubuntu relase image
-wget "https://cloud-images.ubuntu.com/${RELEASE}/current/${RELEASE}-server-cloudimg-amd64.img"
+# Fail before the download if the TEMPLATE_ID is already in use
+if qm status "$TEMPLATE_ID" > /dev/null 2>&1; then
+    echo "Error: TEMPLATE_ID $TEMPLATE_ID already exists."
+    exit 1
+fi
+
+# Release specific names, derived once now that RELEASE is known
+TEMPLATE_NAME="ubuntu-${RELEASE}-template"
+IMAGE_NAME="${RELEASE}-server-cloudimg-amd64.img"
+IMAGE_URL="${IMAGE_MIRROR}/${RELEASE}/current/${IMAGE_NAME}"
+IMAGE_PATH="${IMAGE_DIR}/${IMAGE_NAME}"
+
+# Look up the published checksum for the image
+EXPECTED_SHA256=$(wget -qO- "${IMAGE_MIRROR}/${RELEASE}/current/SHA256SUMS" | awk -v name="*${IMAGE_NAME}" '$2 == name { print $1 }')
+if [ -z "$EXPECTED_SHA256" ]; then
+    echo "Error: No checksum found for ${IMAGE_NAME}."
+    exit 1
+fi
+
+# Get the ubuntu relase image, skipping the download when the cached copy
+# matches the server's Last-Modified time and size, and resuming a partial
+# download left by an interrupted run (the checksum check below catches a
+# partial file that upstream has since replaced). This runs in the
+# background since nothing before the disk import needs the image.
+# Without a terminal wget logs a line per 50K, so report per 32M instead.
+if [ -t 2 ]; then
+    WGET_PROGRESS="bar"
+else
+    WGET_PROGRESS="dot:giga"
+fi
+wget --timestamping --no-if-modified-since --continue --progress="$WGET_PROGRESS" --directory-prefix "$IMAGE_DIR" "$IMAGE_URL" &
+DOWNLOAD_PID=$!
+
+# If the script stops before the template is finished, stop the download
+# and remove the unfinished VM so the TEMPLATE_ID can be reused
+VM_CREATED=false
+cleanup() {
+    kill "$DOWNLOAD_PID" 2> /dev/null || true
+    if [ "$VM_CREATED" = true ]; then
+        echo "Removing unfinished VM $TEMPLATE_ID"
+        qm destroy "$TEMPLATE_ID" || true
+    fi
+}
+trap cleanup EXIT
 
 # Create a VM
-qm create "${TEMPLATE_ID} "--name "${TEMPLATE_NAME}" --memory 2048 --net0 virtio,bridge=${VM_BRIDGE}
+qm create "${TEMPLATE_ID}" --name "${TEMPLATE_NAME}" --memory 2048 --net0 virtio,bridge=${VM_BRIDGE}
+VM_CREATED=true
 
-qm importdisk "$TEMPLATE_ID" "${RELEASE}-server-cloudimg-amd64.img" $DATA_STORE -format qcow2
+# Wait for the image download to finish (set -e exits if it failed)
+wait "$DOWNLOAD_PID"
 
-qm set"$TEMPLATE_ID"--scsihw virtio-scsi-pci --scsi0 $DATA_STORE:"vm-$TEMPLATE_ID-disk-0"
+# Verify the image, dropping it from the cache so a bad copy isn't reused.
+# Exiting here runs cleanup, which removes the unfinished VM as well.
+if ! echo "${EXPECTED_SHA256}  ${IMAGE_PATH}" | sha256sum --check --quiet; then
+    echo "Error: Checksum mismatch for ${IMAGE_PATH}, removing it and VM ${TEMPLATE_ID}."
+    rm -f "$IMAGE_PATH"
+    exit 1
+fi
 
-qm set"$TEMPLATE_ID"--ide2 local:cloudinit --boot c --bootdisk scsi0 --serial0 socket --vga serial0
+qm importdisk "$TEMPLATE_ID" "$IMAGE_PATH" $DATA_STORE -format qcow2
 
-qm resize"$TEMPLATE_ID"scsi0 +30G
+qm set "$TEMPLATE_ID" --scsihw virtio-scsi-pci --scsi0 $DATA_STORE:"vm-$TEMPLATE_ID-disk-0" \
+    --ide2 local:cloudinit --boot c --bootdisk scsi0 --serial0 socket --vga serial0
 
-qm set"$TEMPLATE_ID"--ipconfig0 ip=dhcp
+qm resize "$TEMPLATE_ID" scsi0 +30G
 
-qm set"$TEMPLATE_ID"--sshkey ~/id_rsa.pub
+qm set "$TEMPLATE_ID" --ipconfig0 ip=dhcp --sshkey ~/id_rsa.pub
 
 qm cloudinit dump "$TEMPLATE_ID" user
 
 qm template "$TEMPLATE_ID"
+trap - EXIT